@@ -1,2 +1,2 @@
-from avt_fresh.api import ApiClient
+from avt_fresh.api import ApiClient, ApiClientPool
 from avt_fresh.token import TokenStoreOnRedis, TokenStoreOnDisk
@@ -1,5 +1,10 @@
+import contextlib
+import cProfile
 import datetime as dt
 import json
+import threading
+import tracemalloc
+import typing
 
 import requests
 
@@ -16,20 +21,32 @@ from avt_fresh.client import (
 )
 from avt_fresh.invoice import (
     FreshbooksInvoice,
+    FreshbooksInvoiceSummary,
+    FreshbooksLine,
+    INCLUDES,
     get_one as get_one_invoice,
+    get_lines as get_invoice_lines,
+    get_raw_page as get_raw_invoice_page,
     get_all_draft_invoices,
     get_all_invoices_for_client_id,
     get_all_invoices_for_org_name,
     get_draft_invoices_for_client_id,
     create as create_invoice,
     update as update_invoice,
+    update_diff as update_invoice_diff,
     delete as delete_invoice,
     send as send_invoice,
 )
+from avt_fresh.http2 import Http2Session
+from avt_fresh.issue import IssueResult, issue_invoices
 from avt_fresh.payments import (
     get_default_payment_options,
     add_payment_option_to_invoice,
 )
+from avt_fresh.profiling import AUTH, DECODE, NETWORK, Profiler, profiled
+from avt_fresh.rate_limit import RateLimiter
+from avt_fresh.receivables import AGE_BUCKETS, Receivables, get_receivables
+from avt_fresh.session import HttpSession, ThreadLocalSession
 from avt_fresh.token import TokenStoreOnDisk, NoToken, TokenStore, TokenTup
 
 
@@ -46,6 +63,13 @@ class AvtFreshException(Exception):
     pass
 
 
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
 class ApiClient:
     def __init__(
         self,
@@ -53,27 +77,118 @@ class ApiClient:
         client_id: str,
         redirect_uri: str,
         account_id: str,
-        token_store: TokenStore = TokenStoreOnDisk,
+        token_store: type[TokenStore] | TokenStore = TokenStoreOnDisk,
         connection_string: str | None = None,
+        session: HttpSession | None = None,
+        http2: bool = False,
+        rate_limiters: typing.Sequence[RateLimiter] = (),
     ):
+        """
+        `token_store`
+          Either a `TokenStore` subclass, which gets instantiated with `connection_string`,
+          or an already instantiated `TokenStore`.
+        `session`
+          What to send everything through: a `requests.Session`, `ThreadLocalSession`,
+          `Http2Session` or anything else fitting `HttpSession`. Pass one in to share its
+          connection pool with other `ApiClient`s. The default is a `ThreadLocalSession`,
+          so an `ApiClient` can be shared between threads.
+        `http2`
+          Without a `session`, multiplex requests over a single HTTP/2 connection
+          (see `avt_fresh.http2`) rather than using `requests`.
+        `rate_limiters`
+          Every request waits its turn with each of these, in order.
+        """
         self.client_secret = client_secret
         self.client_id = client_id
         self.redirect_uri = redirect_uri
         self.account_id = account_id
         self.url_lookup = self._make_url_lookup(account_id)
-        self.token_store = token_store(connection_string)
+        if isinstance(token_store, TokenStore):
+            self.token_store = token_store
+        else:
+            self.token_store = token_store(connection_string)
+        if session is None:
+            session = Http2Session() if http2 else ThreadLocalSession()
+        self.session = session
+        self.rate_limiters = tuple(rate_limiters)
+        self._token_lock = threading.Lock()
+        self._in_flight: dict[tuple, _InFlight] = {}
+        self._in_flight_lock = threading.Lock()
+        self._write_generation = 0
+        self.profiler: Profiler | None = None
+        self._profile_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def profile(
+        self, trace_allocations: bool = False, pstats_path: str | None = None
+    ) -> typing.Iterator[Profiler]:
+        """
+        Time every call made inside the block, split into auth (getting a token),
+        network, JSON decoding and parsing, e.g.
+
+            with client.profile() as profiler:
+                client.get_all_draft_invoices()
+            print(profiler.summary())
+
+        `pstats_path`
+          Also run `cProfile` over the block (in this thread) and dump its stats here.
+
+        Calls from other threads made during the block are profiled too, but only one
+        `profile()` block can be active on a client at a time: a nested or concurrent one
+        raises `AvtFreshException`.
+        """
+        if not self._profile_lock.acquire(blocking=False):
+            raise AvtFreshException("this ApiClient is already being profiled")
+        profiler = self.profiler = Profiler(trace_allocations=trace_allocations)
+        c_profile = cProfile.Profile() if pstats_path is not None else None
+        # leave tracing alone if somebody else already started it
+        start_tracing = trace_allocations and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        if c_profile is not None:
+            c_profile.enable()
+        try:
+            yield profiler
+        finally:
+            if c_profile is not None:
+                c_profile.disable()
+                c_profile.dump_stats(pstats_path)
+            if start_tracing:
+                tracemalloc.stop()
+            self.profiler = None
+            self._profile_lock.release()
+
+    def _phase(self, name: str):
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.phase(name)
 
     def make_headers(self):
         return {**HEADERS, "Authorization": f"Bearer {self._get_access_token()}"}
 
     def _get_access_token(self, authorization_code: str | None = None) -> str:
         if authorization_code:
-            token = self._get_token_from_api_with_authorization_code(
-                authorization_code=authorization_code
-            )
-            self.token_store.set(token)
-            return token["access_token"]
+            with self._token_lock:
+                token = self._get_token_from_api_with_authorization_code(
+                    authorization_code=authorization_code
+                )
+                self.token_store.set(token)
+                return token["access_token"]
 
+        try:
+            token = self.token_store.get()
+        except NoToken:
+            pass
+        else:
+            if not _is_expired(token):
+                return token.access_token
+
+        with self._token_lock:
+            return self._get_new_access_token()
+
+    def _get_new_access_token(self) -> str:
+        """Only call this holding `_token_lock`."""
+        # another thread may have gotten a new token while this one waited for the lock
         try:
             token = self.token_store.get()
         except NoToken:
@@ -108,7 +223,7 @@ class ApiClient:
             "grant_type": "authorization_code",  # get this by visiting
             "code": authorization_code,
         }
-        res = requests.post(URL, data=json.dumps(payload), headers=HEADERS)
+        res = self.session.post(URL, data=json.dumps(payload), headers=HEADERS)
         return _return_or_raise(res, payload)
 
     def _get_token_from_api_with_refresh_token(self, refresh_token: str) -> dict:
@@ -133,7 +248,7 @@ class ApiClient:
             "refresh_token": refresh_token,
         }
 
-        res = requests.post(URL, data=json.dumps(payload), headers=HEADERS)
+        res = self.session.post(URL, data=json.dumps(payload), headers=HEADERS)
         return _return_or_raise(res, payload)
 
     @staticmethod
@@ -157,7 +272,8 @@ class ApiClient:
         else:
             url = self.url_lookup[what]
 
-        method, arg_name = REQUEST_LOOKUP[method_name]
+        method_attr, arg_name = REQUEST_LOOKUP[method_name]
+        method = getattr(self.session, method_attr)
         if endpoint == "" or endpoint.startswith("?"):
             rendered_url = f"{url}{endpoint}"
         else:
@@ -171,21 +287,28 @@ class ApiClient:
 
         print(rendered_url)
 
-        raw_response = method(
-            rendered_url,
-            **{
-                arg_name: stuff or {},
-                "headers": self.make_headers(),
-            },
-        )
+        with self._phase(AUTH):
+            headers = self.make_headers()
+        with self._phase(NETWORK), contextlib.ExitStack() as limits:
+            for rate_limiter in self.rate_limiters:
+                limits.enter_context(rate_limiter)
+            raw_response = method(
+                rendered_url,
+                **{
+                    arg_name: stuff or {},
+                    "headers": headers,
+                },
+            )
         if not raw_response.ok:
             raise Exception(
                 f"response: {raw_response.reason}\nrendered_url: '{rendered_url}'\nstuff:{stuff}"
             )
+        with self._phase(DECODE):
+            response_json = raw_response.json()
         try:
-            response = raw_response.json()["response"]
+            response = response_json["response"]
         except KeyError:
-            return raw_response.json()
+            return response_json
         if "result" in response:
             return response["result"]
         raise Exception(
@@ -193,37 +316,136 @@ class ApiClient:
         )
 
     def _GET(self, *, what: str, endpoint: str, params=None):
-        return self._REQUEST(
-            what=what, method_name="GET", endpoint=endpoint, stuff=params
-        )
+        """
+        Concurrent identical GETs (same `what`, `endpoint` and `params`) are coalesced:
+        the first caller makes the request and everyone else waiting on it gets the
+        same parsed response (or exception). A GET never joins one which started before
+        the latest write finished, so nobody reads data older than their own writes.
+        """
+        with self._in_flight_lock:
+            key = (self._write_generation, what, endpoint, _freeze(params))
+            in_flight = self._in_flight.get(key)
+            is_leader = in_flight is None
+            if is_leader:
+                in_flight = self._in_flight[key] = _InFlight()
+
+        if not is_leader:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            in_flight.result = self._REQUEST(
+                what=what, method_name="GET", endpoint=endpoint, stuff=params
+            )
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            in_flight.done.set()
+        return in_flight.result
 
     def _POST(self, *, what: str, endpoint: str, data: dict):
-        return self._REQUEST(
-            what=what, method_name="POST", endpoint=endpoint, stuff=data
-        )
+        try:
+            return self._REQUEST(
+                what=what, method_name="POST", endpoint=endpoint, stuff=data
+            )
+        finally:
+            self._bump_write_generation()
 
     def _PUT(self, *, what: str, thing_id: int, data: dict):
-        return self._REQUEST(
-            what=what, method_name="PUT", endpoint=f"/{thing_id}", stuff=data
+        try:
+            return self._REQUEST(
+                what=what, method_name="PUT", endpoint=f"/{thing_id}", stuff=data
+            )
+        finally:
+            self._bump_write_generation()
+
+    def _bump_write_generation(self) -> None:
+        # even a failed write may have gone through
+        with self._in_flight_lock:
+            self._write_generation += 1
+
+    @profiled
+    def get_one_invoice(
+        self, invoice_id: int, includes: typing.Iterable[str] = INCLUDES
+    ) -> FreshbooksInvoice | FreshbooksInvoiceSummary:
+        return get_one_invoice(
+            get_func=self._GET, invoice_id=invoice_id, includes=includes
         )
 
-    def get_one_invoice(self, invoice_id: int) -> FreshbooksInvoice:
-        return get_one_invoice(get_func=self._GET, invoice_id=invoice_id)
+    @profiled
+    def get_invoice_lines(self, invoice_id: int) -> list[FreshbooksLine]:
+        return get_invoice_lines(get_func=self._GET, invoice_id=invoice_id)
+
+    @profiled
+    def get_all_draft_invoices(
+        self, includes: typing.Iterable[str] = INCLUDES
+    ) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
+        return get_all_draft_invoices(get_func=self._GET, includes=includes)
+
+    @profiled
+    def get_all_invoices_for_org_name(
+        self, org_name: str, includes: typing.Iterable[str] = INCLUDES
+    ) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
+        return get_all_invoices_for_org_name(
+            get_func=self._GET, org_name=org_name, includes=includes
+        )
 
-    def get_all_draft_invoices(self) -> list[FreshbooksInvoice]:
-        return get_all_draft_invoices(get_func=self._GET)
+    @profiled
+    def get_all_invoices_for_client_id(
+        self, client_id: int, includes: typing.Iterable[str] = INCLUDES
+    ) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
+        return get_all_invoices_for_client_id(
+            get_func=self._GET, client_id=client_id, includes=includes
+        )
 
-    def get_all_invoices_for_org_name(self, org_name: str) -> list[FreshbooksInvoice]:
-        return get_all_invoices_for_org_name(get_func=self._GET, org_name=org_name)
+    @profiled
+    def get_draft_invoices_for_client_id(
+        self, client_id: int, includes: typing.Iterable[str] = INCLUDES
+    ) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
+        return get_draft_invoices_for_client_id(
+            get_func=self._GET, client_id=client_id, includes=includes
+        )
 
-    def get_all_invoices_for_client_id(self, client_id: int) -> list[FreshbooksInvoice]:
-        return get_all_invoices_for_client_id(get_func=self._GET, client_id=client_id)
+    @profiled
+    def get_raw_invoice_page(
+        self,
+        page: int,
+        client_id: int | None = None,
+        status: str | None = None,
+        includes: typing.Iterable[str] = (),
+        per_page: int = 100,
+    ) -> dict:
+        return get_raw_invoice_page(
+            get_func=self._GET,
+            page=page,
+            client_id=client_id,
+            status=status,
+            includes=includes,
+            per_page=per_page,
+        )
 
-    def get_draft_invoices_for_client_id(
-        self, client_id: int
-    ) -> list[FreshbooksInvoice]:
-        return get_draft_invoices_for_client_id(get_func=self._GET, client_id=client_id)
+    @profiled
+    def get_receivables(
+        self,
+        client_id: int | None = None,
+        status: str | None = None,
+        as_of: dt.date | None = None,
+        age_buckets=AGE_BUCKETS,
+    ) -> Receivables:
+        return get_receivables(
+            get_func=self._GET,
+            client_id=client_id,
+            status=status,
+            as_of=as_of,
+            age_buckets=age_buckets,
+        )
 
+    @profiled
     def create_invoice(
         self,
         *,
@@ -246,31 +468,61 @@ class ApiClient:
             create_date=create_date,
         )
 
+    def issue_invoices(
+        self,
+        batch: list[dict],
+        gateway_name: str | None = None,
+        workers_per_stage: int = 4,
+    ) -> list[IssueResult]:
+        return issue_invoices(
+            create_func=self.create_invoice,
+            add_payment_option_func=self.add_payment_option_to_invoice,
+            send_func=self.send_invoice,
+            get_default_payment_options_func=self.get_default_payment_options,
+            batch=batch,
+            gateway_name=gateway_name,
+            workers_per_stage=workers_per_stage,
+        )
+
+    @profiled
     def update_invoice(self, invoice_id: int, **kwargs) -> dict:
         return update_invoice(put_func=self._PUT, invoice_id=invoice_id, **kwargs)
 
+    @profiled
+    def update_invoice_diff(
+        self, old: FreshbooksInvoice, new: FreshbooksInvoice
+    ) -> dict | None:
+        return update_invoice_diff(put_func=self._PUT, old=old, new=new)
+
+    @profiled
     def delete_invoice(self, invoice_id: int) -> dict:
         return delete_invoice(put_func=self._PUT, invoice_id=invoice_id)
 
+    @profiled
     def send_invoice(self, invoice_id: int) -> dict:
         return send_invoice(put_func=self._PUT, invoice_id=invoice_id)
 
+    @profiled
     def get_freshbooks_client_from_email(self, email: str) -> FreshbooksClient:
         return get_freshbooks_client_from_email(get_func=self._GET, email=email)
 
+    @profiled
     def get_freshbooks_client_from_client_id(self, client_id: int) -> FreshbooksClient:
         return get_freshbooks_client_from_client_id(
             get_func=self._GET, client_id=client_id
         )
 
+    @profiled
     def get_freshbooks_client_from_org_name(self, org_name: str) -> FreshbooksClient:
         return get_freshbooks_client_from_org_name(
             get_func=self._GET, org_name=org_name
         )
 
+    @profiled
     def get_all_clients(self) -> list[FreshbooksClient]:
         return get_all_clients(get_func=self._GET)
 
+    @profiled
     def create_client(
         self, first_name: str, last_name: str, email: str, organization: str
     ) -> FreshbooksClient:
@@ -283,9 +535,11 @@ class ApiClient:
             organization=organization,
         )
 
+    @profiled
     def delete_client(self, client_id: int) -> None:
         delete_client(put_func=self._PUT, client_id=client_id)
 
+    @profiled
     def add_contacts(self, client_id: int, contacts: list[dict]) -> None:
         add_contacts(
             get_func=self._GET,
@@ -294,14 +548,17 @@ class ApiClient:
             contacts=contacts,
         )
 
+    @profiled
     def delete_contact(self, client_id: int, email: str) -> None:
         delete_contact(
             get_func=self._GET, put_func=self._PUT, client_id=client_id, email=email
         )
 
+    @profiled
     def get_default_payment_options(self) -> dict:
         return get_default_payment_options(get_func=self._GET)
 
+    @profiled
     def add_payment_option_to_invoice(
         self, invoice_id: int, gateway_name: str = "stripe"
     ) -> dict:
@@ -311,12 +568,126 @@ class ApiClient:
 
 
 REQUEST_LOOKUP = {
-    "GET": (requests.get, "params"),
-    "PUT": (requests.put, "json"),
-    "POST": (requests.post, "json"),
+    "GET": ("get", "params"),
+    "PUT": ("put", "json"),
+    "POST": ("post", "json"),
 }
 
 
+class ApiClientPool:
+    """
+    Hands out one `ApiClient` per FreshBooks account, all of them sending their requests
+    through a single session (and so a single connection pool). Each account
+    keeps its own token store, made with `token_store.for_account`, and URL lookup.
+
+    `max_per_second`, `max_in_flight`
+      Limits on requests across all accounts together.
+    `account_max_per_second`, `account_max_in_flight`
+      Limits on each account's requests, so one busy account can't hog the whole pool.
+    """
+
+    def __init__(
+        self,
+        client_secret: str,
+        client_id: str,
+        redirect_uri: str,
+        token_store: type[TokenStore] = TokenStoreOnDisk,
+        connection_string: str | None = None,
+        session: HttpSession | None = None,
+        pool_maxsize: int = 32,
+        http2: bool = False,
+        max_per_second: float | None = None,
+        max_in_flight: int | None = None,
+        account_max_per_second: float | None = None,
+        account_max_in_flight: int | None = None,
+    ):
+        self.client_secret = client_secret
+        self.client_id = client_id
+        self.redirect_uri = redirect_uri
+        self.token_store = token_store
+        self.connection_string = connection_string
+        if not hasattr(token_store, "for_account"):
+            raise AvtFreshException(
+                f"{token_store.__name__} has no `for_account`, "
+                "so it can't make a token store per account"
+            )
+        self.token_store_connection = token_store.connect(connection_string)
+        self.rate_limiter = RateLimiter(
+            per_second=max_per_second, max_in_flight=max_in_flight
+        )
+        self.account_max_per_second = account_max_per_second
+        self.account_max_in_flight = account_max_in_flight
+        if session is None and http2:
+            session = Http2Session()
+        elif session is None:
+            session = ThreadLocalSession(pool_maxsize=pool_maxsize)
+        self.session = session
+        self._clients: dict[str, ApiClient] = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self, account_id: str, token_store: TokenStore | None = None
+    ) -> ApiClient:
+        """
+        Register `account_id`, optionally with a token store of its own. Raises
+        `AvtFreshException` if it's already registered.
+        """
+        with self._lock:
+            if account_id in self._clients:
+                raise AvtFreshException(f"account {account_id} is already in the pool")
+            client = self._clients[account_id] = self._make_client(
+                account_id, token_store
+            )
+        return client
+
+    def get(self, account_id: str) -> ApiClient:
+        with self._lock:
+            client = self._clients.get(account_id)
+            if client is None:
+                client = self._clients[account_id] = self._make_client(account_id)
+        return client
+
+    def _make_client(
+        self, account_id: str, token_store: TokenStore | None = None
+    ) -> ApiClient:
+        return ApiClient(
+            client_secret=self.client_secret,
+            client_id=self.client_id,
+            redirect_uri=self.redirect_uri,
+            account_id=account_id,
+            token_store=token_store
+            or self.token_store.for_account(
+                self.connection_string,
+                account_id,
+                connection=self.token_store_connection,
+            ),
+            session=self.session,
+            # the account's own limiter first, so waiting on it doesn't hold a shared slot
+            rate_limiters=(
+                RateLimiter(
+                    per_second=self.account_max_per_second,
+                    max_in_flight=self.account_max_in_flight,
+                ),
+                self.rate_limiter,
+            ),
+        )
+
+    def __getitem__(self, account_id: str) -> ApiClient:
+        return self.get(account_id)
+
+    def __contains__(self, account_id: str) -> bool:
+        return account_id in self._clients
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+def _freeze(params: dict | None) -> tuple:
+    if not params:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in params.items()))
+
+
 def _get_code_from_user() -> str:
     return input(
         "Please go here and get an auth code: "
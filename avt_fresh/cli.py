@@ -0,0 +1,289 @@
+"""
+`avt-fresh`: bulk jobs against the Freshbooks API from the command line.
+
+Credentials come from the environment: FRESHBOOKS_CLIENT_SECRET, FRESHBOOKS_CLIENT_ID,
+FRESHBOOKS_REDIRECT_URI and FRESHBOOKS_ACCOUNT_ID, plus FRESHBOOKS_REDIS_URL if the OAuth
+token should live in Redis rather than on disk.
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import json
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+import typing
+
+from avt_fresh.api import ApiClient
+from avt_fresh.rate_limit import RateLimiter
+from avt_fresh.token import TokenStoreOnDisk, TokenStoreOnRedis
+
+CSV_FIELDS = (
+    "id",
+    "invoice_number",
+    "customerid",
+    "organization",
+    "create_date",
+    "v3_status",
+    "amount",
+    "outstanding",
+    "po_number",
+)
+
+
+class Checkpoint:
+    """The keys of finished tasks, one per line, so an interrupted run can pick up again."""
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.done: set[str] = set()
+        if path is not None and path.exists():
+            self.done = set(path.read_text(encoding="utf-8").split())
+        self._lock = threading.Lock()
+
+    def mark(self, key: str) -> None:
+        self.mark_many([key])
+
+    def mark_many(self, keys: typing.Iterable[str]) -> None:
+        keys = list(keys)
+        with self._lock:
+            self.done.update(keys)
+            if self.path is not None and keys:
+                with self.path.open("a", encoding="utf-8") as fout:
+                    fout.write("".join(f"{key}\n" for key in keys))
+
+
+class Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = self.failed = 0
+        self.start = time.monotonic()
+
+    def update(self, ok: bool) -> None:
+        self.done += 1
+        self.failed += not ok
+        elapsed = time.monotonic() - self.start
+        print(
+            f"\r{self.done}/{self.total} done, {self.failed} failed, "
+            f"{self.done / elapsed if elapsed else 0:.1f}/s",
+            end="",
+            file=sys.stderr,
+        )
+
+    def finish(self) -> None:
+        print(file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _make_parser().parse_args(argv)
+    client = _make_client(args)
+    return args.func(client, args)
+
+
+def export_invoices(client: ApiClient, args) -> int:
+    """
+    The checkpoint holds the IDs of invoices already written rather than page numbers,
+    since pages shift whenever invoices are created or deleted between runs. Every run
+    goes through all the pages and writes only the invoices it hasn't seen yet.
+
+    Without a checkpoint the output is overwritten, with one it's appended to.
+    """
+    output = Path(args.output)
+    output_format = args.format or ("csv" if output.suffix == ".csv" else "jsonl")
+    checkpoint = Checkpoint(_checkpoint_path(args))
+    write_lock = threading.Lock()
+    first_page = client.get_raw_invoice_page(
+        1, client_id=args.client_id, status=args.status
+    )
+    mode = "a" if checkpoint.path is not None else "w"
+    needs_header = mode == "w" or not output.exists() or not output.stat().st_size
+
+    with output.open(mode, encoding="utf-8", newline="") as fout:
+        if output_format == "csv":
+            writer = csv.DictWriter(fout, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            if needs_header:
+                writer.writeheader()
+            write = lambda invoice: writer.writerow(_flatten(invoice))
+        else:
+            write = lambda invoice: fout.write(json.dumps(invoice) + "\n")
+
+        def export_page(page: int) -> None:
+            if page == 1:
+                invoices = first_page["invoices"]
+            else:
+                invoices = client.get_raw_invoice_page(
+                    page, client_id=args.client_id, status=args.status
+                )["invoices"]
+            with write_lock:
+                written = []
+                for invoice in invoices:
+                    invoice_id = str(invoice["id"])
+                    if invoice_id not in checkpoint.done and invoice_id not in written:
+                        write(invoice)
+                        written.append(invoice_id)
+                fout.flush()
+                checkpoint.mark_many(written)
+
+        return _run(
+            [
+                (str(page), lambda page=page: export_page(page))
+                for page in range(1, first_page["pages"] + 1)
+            ],
+            args=args,
+            # pages are always all fetched; `checkpoint` works at the invoice level
+            checkpoint=Checkpoint(None),
+        )
+
+
+def send_drafts(client: ApiClient, args) -> int:
+    return _run(
+        [
+            (str(draft.invoice_id), lambda i=draft.invoice_id: client.send_invoice(i))
+            for draft in client.get_all_draft_invoices(includes=())
+        ],
+        args=args,
+        checkpoint=Checkpoint(_checkpoint_path(args)),
+    )
+
+
+def delete_invoices(client: ApiClient, args) -> int:
+    invoice_ids = list(args.invoice_ids)
+    if args.ids_file:
+        invoice_ids += Path(args.ids_file).read_text(encoding="utf-8").split()
+    return _run(
+        [
+            (str(i), lambda i=i: client.delete_invoice(int(i)))
+            for i in dict.fromkeys(invoice_ids)
+        ],
+        args=args,
+        checkpoint=Checkpoint(_checkpoint_path(args)),
+    )
+
+
+def sync_contacts(client: ApiClient, args) -> int:
+    """`args.file` is a CSV with columns client_id, email, fname and lname."""
+    contacts_by_client_id = collections.defaultdict(list)
+    with open(args.file, encoding="utf-8", newline="") as fin:
+        for row in csv.DictReader(fin):
+            contacts_by_client_id[row["client_id"]].append(
+                {"email": row["email"], "fname": row["fname"], "lname": row["lname"]}
+            )
+    return _run(
+        [
+            (
+                client_id,
+                lambda client_id=client_id, contacts=contacts: client.add_contacts(
+                    int(client_id), contacts
+                ),
+            )
+            for client_id, contacts in contacts_by_client_id.items()
+        ],
+        args=args,
+        checkpoint=Checkpoint(_checkpoint_path(args)),
+    )
+
+
+def _run(
+    tasks: list[tuple[str, typing.Callable]], *, args, checkpoint: Checkpoint
+) -> int:
+    """Run the tasks not already in `checkpoint` concurrently. Returns an exit code."""
+    tasks = [(key, task) for key, task in tasks if key not in checkpoint.done]
+    progress = Progress(len(tasks))
+    errors = []
+
+    def run_one(key: str, task: typing.Callable) -> None:
+        task()
+        checkpoint.mark(key)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(run_one, key, task): key for key, task in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            error = future.exception()
+            if error is not None:
+                errors.append((futures[future], error))
+            progress.update(ok=error is None)
+    progress.finish()
+
+    for key, error in errors:
+        print(f"{key}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def _make_client(args) -> ApiClient:
+    redis_url = os.environ.get("FRESHBOOKS_REDIS_URL")
+    return ApiClient(
+        client_secret=os.environ["FRESHBOOKS_CLIENT_SECRET"],
+        client_id=os.environ["FRESHBOOKS_CLIENT_ID"],
+        redirect_uri=os.environ["FRESHBOOKS_REDIRECT_URI"],
+        account_id=os.environ["FRESHBOOKS_ACCOUNT_ID"],
+        token_store=TokenStoreOnRedis if redis_url else TokenStoreOnDisk,
+        connection_string=redis_url,
+        rate_limiters=(RateLimiter(per_second=args.max_per_second),),
+    )
+
+
+def _make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="avt-fresh", description=__doc__)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--workers", type=int, default=8)
+    common.add_argument(
+        "--max-per-second",
+        type=float,
+        help="send no more than this many requests a second",
+    )
+    common.add_argument(
+        "--checkpoint",
+        help="file recording finished tasks; rerun with the same one to resume",
+    )
+    subparsers = parser.add_subparsers(required=True)
+
+    export = subparsers.add_parser(
+        "export-invoices", parents=[common], help="stream invoices to JSONL or CSV"
+    )
+    export.add_argument(
+        "output", help="overwritten, or appended to with --checkpoint"
+    )
+    export.add_argument("--format", choices=("jsonl", "csv"))
+    export.add_argument("--client-id", type=int)
+    export.add_argument("--status")
+    export.set_defaults(func=export_invoices)
+
+    send = subparsers.add_parser(
+        "send-drafts", parents=[common], help="send every draft invoice"
+    )
+    send.set_defaults(func=send_drafts)
+
+    delete = subparsers.add_parser(
+        "delete-invoices", parents=[common], help="delete invoices by ID"
+    )
+    delete.add_argument("invoice_ids", nargs="*")
+    delete.add_argument("--ids-file", help="whitespace-separated invoice IDs")
+    delete.set_defaults(func=delete_invoices)
+
+    sync = subparsers.add_parser(
+        "sync-contacts",
+        parents=[common],
+        help="add or update client contacts from a CSV (client_id,email,fname,lname)",
+    )
+    sync.add_argument("file")
+    sync.set_defaults(func=sync_contacts)
+    return parser
+
+
+def _checkpoint_path(args) -> Path | None:
+    return Path(args.checkpoint) if args.checkpoint else None
+
+
+def _flatten(invoice: dict) -> dict:
+    return {
+        **invoice,
+        "amount": invoice["amount"]["amount"],
+        "outstanding": invoice["outstanding"]["amount"],
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+An HTTP/2 transport for `ApiClient`, built on `httpx`. Install it with
+`pip install avt-fresh[http2]`.
+
+One connection carries every concurrent request as its own stream, instead of one
+connection per in-flight request as with `requests`.
+"""
+import datetime as dt
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class Http2Response:
+    """Just enough of a `requests.Response` for `ApiClient`."""
+
+    def __init__(self, response: "httpx.Response"):
+        self.response = response
+
+    @property
+    def ok(self) -> bool:
+        return self.response.is_success
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    @property
+    def reason(self) -> str:
+        return self.response.reason_phrase
+
+    @property
+    def content(self) -> bytes:
+        return self.response.content
+
+    @property
+    def text(self) -> str:
+        return self.response.text
+
+    @property
+    def elapsed(self) -> dt.timedelta:
+        return self.response.elapsed
+
+    @property
+    def http_version(self) -> str:
+        return self.response.http_version
+
+    def json(self):
+        return self.response.json()
+
+
+class Http2Session:
+    """
+    A stand-in for `requests.Session` which speaks HTTP/2. It's safe to share between
+    threads: that's the point, since they all end up multiplexed over one connection.
+
+    `client_kwargs` go to `httpx.Client`, e.g. `limits` or `timeout`. Unlike httpx's
+    default of five seconds there's no timeout unless you pass one, same as with
+    `requests`: big listings can take a while.
+
+    Errors come from httpx, e.g. `httpx.ConnectError` or `httpx.ReadTimeout`, rather than
+    their `requests.exceptions` equivalents.
+    """
+
+    def __init__(self, **client_kwargs):
+        if httpx is None:
+            raise ImportError(
+                "HTTP/2 support needs httpx: pip install avt-fresh[http2]"
+            )
+        client_kwargs.setdefault("timeout", None)
+        self.client = httpx.Client(http2=True, **client_kwargs)
+
+    def request(
+        self, method: str, url: str, params=None, data=None, json=None, headers=None
+    ) -> Http2Response:
+        if params:
+            # httpx replaces a URL's query string with `params` rather than adding to it
+            url = httpx.URL(url).copy_merge_params(params)
+        return Http2Response(
+            self.client.request(
+                method, url, content=data, json=json, headers=headers
+            )
+        )
+
+    def get(self, url: str, **kwargs) -> Http2Response:
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> Http2Response:
+        return self.request("PUT", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> Http2Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
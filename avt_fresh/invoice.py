@@ -98,10 +98,43 @@ class FreshbooksInvoice(typing.NamedTuple):
         line_description_line_dict = {line.description: line for line in lines}
 
         return cls(
+            **FreshbooksInvoiceSummary.from_api(**kwargs)._asdict(),
             lines=lines,
             line_description_line_id_dict=line_description_line_id_dict,
             line_description_line_dict=line_description_line_dict,
             line_id_line_dict=line_id_line_dict,
+        )
+
+    def __rich_repr__(self):
+        yield "invoice_id", self.invoice_id
+        yield "invoice_number", self.number
+        yield "organization", self.organization
+        yield "date", self.date
+        yield "status", self.status
+        yield "amount", self.amount
+        yield "lines", self.lines
+        yield "contacts", self.contacts
+
+
+class FreshbooksInvoiceSummary(typing.NamedTuple):
+    """What you get instead of a `FreshbooksInvoice` when `lines` aren't included."""
+
+    notes: str
+    client_id: int
+    date: dt.date
+    invoice_id: int
+    number: str
+    organization: str
+    amount: decimal.Decimal
+    status: str
+    amount_outstanding: decimal.Decimal
+    po_number: str
+    contacts: dict[str, dict]
+    allowed_gateways: list
+
+    @classmethod
+    def from_api(cls, **kwargs):
+        return cls(
             notes=kwargs["notes"],
             client_id=kwargs["customerid"],
             date=dt.date.fromisoformat(kwargs["create_date"]),
@@ -109,10 +142,12 @@ class FreshbooksInvoice(typing.NamedTuple):
             po_number=kwargs["po_number"],
             number=kwargs["invoice_number"],
             organization=kwargs["organization"],
-            allowed_gateways=kwargs["allowed_gateways"],
+            allowed_gateways=kwargs.get("allowed_gateways", []),
             amount=decimal.Decimal(kwargs["amount"]["amount"]),
             amount_outstanding=decimal.Decimal(kwargs["outstanding"]["amount"]),
-            contacts={contact["email"]: contact for contact in kwargs["contacts"]},
+            contacts={
+                contact["email"]: contact for contact in kwargs.get("contacts", [])
+            },
             status=kwargs["v3_status"],
         )
 
@@ -123,36 +158,56 @@ class FreshbooksInvoice(typing.NamedTuple):
         yield "date", self.date
         yield "status", self.status
         yield "amount", self.amount
-        yield "lines", self.lines
-        yield "contacts", self.contacts
+        yield "amount_outstanding", self.amount_outstanding
 
 
-def get_all_draft_invoices(*, get_func: typing.Callable) -> list[FreshbooksInvoice]:
-    return _get(get_func=get_func, status="draft")
+INCLUDES = ("lines", "contacts", "allowed_gateways")
+
+
+def get_all_draft_invoices(
+    *, get_func: typing.Callable, includes: typing.Iterable[str] = INCLUDES
+) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
+    return _get(get_func=get_func, status="draft", includes=includes)
 
 
 def get_all_invoices_for_org_name(
-    *, get_func: typing.Callable, org_name: str
-) -> list[FreshbooksInvoice]:
+    *,
+    get_func: typing.Callable,
+    org_name: str,
+    includes: typing.Iterable[str] = INCLUDES,
+) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
     from avt_fresh.client import get_freshbooks_client_from_org_name
     client_id = get_freshbooks_client_from_org_name(get_func=get_func, org_name=org_name).client_id
-    return get_all_invoices_for_client_id(get_func=get_func, client_id=client_id)
+    return get_all_invoices_for_client_id(
+        get_func=get_func, client_id=client_id, includes=includes
+    )
 
 
 def get_all_invoices_for_client_id(
-    *, get_func: typing.Callable, client_id: int
-) -> list[FreshbooksInvoice]:
-    return _get(get_func=get_func, client_id=client_id)
+    *,
+    get_func: typing.Callable,
+    client_id: int,
+    includes: typing.Iterable[str] = INCLUDES,
+) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
+    return _get(get_func=get_func, client_id=client_id, includes=includes)
 
 
 def get_draft_invoices_for_client_id(
-    *, get_func: typing.Callable, client_id: int
-) -> list[FreshbooksInvoice]:
-    return _get(get_func=get_func, client_id=client_id, status="draft")
+    *,
+    get_func: typing.Callable,
+    client_id: int,
+    includes: typing.Iterable[str] = INCLUDES,
+) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
+    return _get(get_func=get_func, client_id=client_id, status="draft", includes=includes)
 
 
-def get_one(*, get_func: typing.Callable, invoice_id: int) -> FreshbooksInvoice:
-    invoices = _get(get_func=get_func, invoice_id=invoice_id)
+def get_one(
+    *,
+    get_func: typing.Callable,
+    invoice_id: int,
+    includes: typing.Iterable[str] = INCLUDES,
+) -> FreshbooksInvoice | FreshbooksInvoiceSummary:
+    invoices = _get(get_func=get_func, invoice_id=invoice_id, includes=includes)
     if invoices:
         if len(invoices) > 1:
             raise MoreThanOne
@@ -160,14 +215,87 @@ def get_one(*, get_func: typing.Callable, invoice_id: int) -> FreshbooksInvoice:
     raise DoesntExist
 
 
+def get_lines(*, get_func: typing.Callable, invoice_id: int) -> list[FreshbooksLine]:
+    """For filling in the lines of a `FreshbooksInvoiceSummary` when you need them."""
+    invoice = get_func(what=WHAT, endpoint=f"/{invoice_id}?include[]=lines")["invoice"]
+    return [
+        FreshbooksLine.from_api(
+            invoice_id=invoice["id"], client_id=invoice["customerid"], **line
+        )
+        for line in invoice["lines"]
+    ]
+
+
+def iter_raw(
+    *,
+    get_func: typing.Callable,
+    client_id=None,
+    status=None,
+    includes: typing.Iterable[str] = (),
+    per_page: int = 100,
+) -> typing.Iterator[dict]:
+    """
+    Invoice dictionaries straight from the API, fetched a page at a time, so no more than
+    one page is ever held in memory.
+    """
+    includes = tuple(includes)
+    page = 1
+    while True:
+        result = get_raw_page(
+            get_func=get_func,
+            page=page,
+            client_id=client_id,
+            status=status,
+            includes=includes,
+            per_page=per_page,
+        )
+        yield from result["invoices"]
+        if page >= result["pages"]:
+            return
+        page += 1
+
+
+def get_raw_page(
+    *,
+    get_func: typing.Callable,
+    page: int,
+    client_id=None,
+    status=None,
+    includes: typing.Iterable[str] = (),
+    per_page: int = 100,
+) -> dict:
+    """One page of invoices as the API returns it, including `page`, `pages` and `total`."""
+    params = []
+    if client_id is not None:
+        params.append(f"search[customerid]={client_id}")
+    if status is not None:
+        params.append(f"search[v3_status]={status}")
+    params += [f"include[]={include}" for include in includes]
+    params += [f"per_page={per_page}", f"page={page}"]
+    return get_func(what=WHAT, endpoint="?" + "&".join(params))
+
+
 def _get(
     get_func: typing.Callable,
     invoice_id=None,
     client_id=None,
     org_name=None,
     status=None,
-) -> list[FreshbooksInvoice]:
+    includes: typing.Iterable[str] = INCLUDES,
+) -> list[FreshbooksInvoice | FreshbooksInvoiceSummary]:
+    """
+    `includes`
+      Any of `INCLUDES`. Without "lines" you get `FreshbooksInvoiceSummary`s, which are
+      a lot cheaper to fetch and parse.
+    """
     get_func = functools.partial(get_func, what=WHAT)
+    includes = tuple(includes)
+    include_params = "&".join(f"include[]={include}" for include in includes)
+    parse = (
+        FreshbooksInvoice.from_api
+        if "lines" in includes
+        else FreshbooksInvoiceSummary.from_api
+    )
 
     if client_id is not None and org_name is not None:
         raise ArgumentError("Please provide either client_id or org_name")
@@ -197,20 +325,19 @@ def _get(
     try:
         num_results = response["total"]
     except KeyError:
-        full_url += (
-            f"{sep}include[]=lines&include[]=contacts&include[]=allowed_gateways"
-        )
+        if not include_params:
+            return [parse(**response["invoice"])]
+        full_url += f"{sep}{include_params}"
     else:
         if not num_results:
             return []
-        full_url += (
-            f"{sep}per_page={num_results}"
-            f"&include[]=lines&include[]=contacts&include[]=allowed_gateways"
-        )
+        full_url += f"{sep}per_page={num_results}"
+        if include_params:
+            full_url += f"&{include_params}"
 
     result = get_func(endpoint=full_url)
     if "invoice" in result:
-        return [FreshbooksInvoice.from_api(**result["invoice"])]
+        return [parse(**result["invoice"])]
     invoices = result["invoices"]
 
     if org_name is not None:
@@ -219,7 +346,7 @@ def _get(
     fb_invoices = []
     for invoice in invoices:
         try:
-            fb_invoice = FreshbooksInvoice.from_api(**invoice)
+            fb_invoice = parse(**invoice)
         except ValueError as e:
             raise InvalidField(f"{invoice}") from e
         else:
@@ -278,6 +405,100 @@ def update(*, put_func: typing.Callable, invoice_id, **kwargs) -> dict:
     return put_func(what=WHAT, thing_id=invoice_id, data={"invoice": kwargs})
 
 
+def update_diff(
+    *, put_func: typing.Callable, old: FreshbooksInvoice, new: FreshbooksInvoice
+) -> dict | None:
+    """
+    Send only what's different between `old` and `new` (e.g. `old._replace(notes=...)`).
+    Returns `None` without making a request when nothing changed.
+    """
+    changes = diff(old, new)
+    if not changes:
+        return None
+    return update(put_func=put_func, invoice_id=old.invoice_id, **changes)
+
+
+DIFFABLE_FIELDS = {
+    "notes": "notes",
+    "po_number": "po_number",
+    "date": "create_date",
+    "number": "invoice_number",
+    "client_id": "customerid",
+}
+# these follow from the fields above or can't be written at all
+UNDIFFABLE_FIELDS = (
+    "invoice_id",
+    "organization",
+    "amount",
+    "amount_outstanding",
+    "allowed_gateways",
+)
+
+
+def diff(old: FreshbooksInvoice, new: FreshbooksInvoice) -> dict:
+    """
+    The `invoice` payload of an update turning `old` into `new`, empty if they're the same.
+    Freshbooks replaces the whole set of lines on update, so if any line was added, removed
+    or changed, all of `new.lines` are sent, existing ones with their `lineid`.
+
+    Raises `ArgumentError` if a field which can't be updated (see `UNDIFFABLE_FIELDS`)
+    differs, or if `status` changes to anything but "draft" or "paid".
+    """
+    changed = [
+        attr for attr in UNDIFFABLE_FIELDS if getattr(new, attr) != getattr(old, attr)
+    ]
+    if changed:
+        raise ArgumentError(f"these fields can't be updated: {', '.join(changed)}")
+
+    changes = {}
+    for attr, api_name in DIFFABLE_FIELDS.items():
+        value = getattr(new, attr)
+        if value != getattr(old, attr):
+            changes[api_name] = str(value) if isinstance(value, dt.date) else value
+    if new.status != old.status:
+        try:
+            changes["status"] = STATUS_STRING_INT_LOOKUP[new.status]
+        except KeyError as e:
+            raise ArgumentError(f"can't change status to {new.status}") from e
+    if new.contacts != old.contacts:
+        changes["contacts"] = [
+            {"contactid": contact["contactid"]} for contact in new.contacts.values()
+        ]
+    if _lines_changed(old, new):
+        changes["lines"] = [_line_payload(line) for line in new.lines]
+    return changes
+
+
+LINE_FIELDS = ("name", "description", "rate", "quantity")
+
+
+def _lines_changed(old: FreshbooksInvoice, new: FreshbooksInvoice) -> bool:
+    """Compared by value, so e.g. a `rate` of `Decimal("10")` is the same as "10.00"."""
+    if [line.line_id for line in new.lines] != list(old.line_id_line_dict):
+        return True
+    return any(
+        _line_values(line) != _line_values(old.line_id_line_dict[line.line_id])
+        for line in new.lines
+    )
+
+
+def _line_values(line: FreshbooksLine) -> tuple:
+    return tuple(getattr(line, field) for field in LINE_FIELDS)
+
+
+def _line_payload(line: FreshbooksLine) -> dict:
+    """A line the way the API takes it, unlike `FreshbooksLine.dict_`."""
+    payload = {
+        "name": line.name,
+        "description": line.description,
+        "unit_cost": {"amount": str(line.rate)},
+        "qty": str(line.quantity),
+    }
+    if line.line_id is not None:
+        payload["lineid"] = line.line_id
+    return payload
+
+
 def delete(*, put_func: typing.Callable, invoice_id: int) -> dict:
     return put_func(what=WHAT, thing_id=invoice_id, data={"invoice": {"vis_state": 1}})
 
@@ -0,0 +1,81 @@
+import concurrent.futures
+import threading
+import typing
+
+CREATED = "created"
+PAYMENT_OPTION_ADDED = "payment_option_added"
+SENT = "sent"
+
+
+class IssueResult(typing.NamedTuple):
+    index: int
+    invoice_id: int | None
+    stage: str | None
+    error: Exception | None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __rich_repr__(self):
+        yield "index", self.index
+        yield "invoice_id", self.invoice_id
+        yield "stage", self.stage
+        yield "error", self.error
+
+
+def issue_invoices(
+    *,
+    create_func: typing.Callable,
+    add_payment_option_func: typing.Callable,
+    send_func: typing.Callable,
+    get_default_payment_options_func: typing.Callable,
+    batch: list[dict],
+    gateway_name: str | None = None,
+    workers_per_stage: int = 4,
+) -> list[IssueResult]:
+    """
+    Create, add a payment option to and send every invoice in `batch` (each a dict of
+    `create_func` kwargs). Invoices move through the three stages independently, up to
+    `workers_per_stage` at a time in each, so one invoice can be sent while the next has
+    its payment option added and another is created.
+
+    `gateway_name` defaults to that of the account's default payment options, looked up
+    once for the whole batch.
+
+    The `*_func`s are those of `ApiClient`, e.g. `create_func=client.create_invoice`, so
+    each stage shows up in `ApiClient.profile()` like any other call.
+
+    Returns one `IssueResult` per invoice, in `batch` order, with the last stage reached.
+    """
+    if gateway_name is None:
+        gateway_name = (
+            get_default_payment_options_func()
+            .get("payment_options", {})
+            .get("gateway_name", "stripe")
+        )
+    stage_slots = {
+        stage: threading.BoundedSemaphore(workers_per_stage)
+        for stage in (CREATED, PAYMENT_OPTION_ADDED, SENT)
+    }
+
+    def issue_one(index: int, invoice: dict) -> IssueResult:
+        invoice_id = stage = None
+        try:
+            with stage_slots[CREATED]:
+                invoice_id = create_func(**invoice)["invoice"]["id"]
+            stage = CREATED
+            with stage_slots[PAYMENT_OPTION_ADDED]:
+                add_payment_option_func(invoice_id, gateway_name=gateway_name)
+            stage = PAYMENT_OPTION_ADDED
+            with stage_slots[SENT]:
+                send_func(invoice_id)
+            stage = SENT
+        except Exception as e:
+            return IssueResult(index=index, invoice_id=invoice_id, stage=stage, error=e)
+        return IssueResult(index=index, invoice_id=invoice_id, stage=stage, error=None)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers_per_stage * len(stage_slots)
+    ) as executor:
+        return list(executor.map(issue_one, range(len(batch)), batch))
@@ -0,0 +1,292 @@
+import concurrent.futures
+import datetime as dt
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+import typing
+
+OUTBOX_PATH = Path("freshbooks_outbox.sqlite3")
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+CREATE = "create"
+ADD_PAYMENT_OPTION = "add_payment_option"
+SEND = "send"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    invoice_id INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    in_doubt INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+)
+"""
+COLUMNS = "key, payload, steps, invoice_id, status, attempts, in_doubt, error"
+
+
+class OutboxItem(typing.NamedTuple):
+    key: str
+    payload: dict
+    steps: list[str]
+    invoice_id: int | None
+    status: str
+    attempts: int
+    in_doubt: bool
+    error: str | None
+
+    @classmethod
+    def from_row(
+        cls, key, payload, steps, invoice_id, status, attempts, in_doubt, error
+    ):
+        return cls(
+            key=key,
+            payload=json.loads(payload),
+            steps=json.loads(steps),
+            invoice_id=invoice_id,
+            status=status,
+            attempts=attempts,
+            in_doubt=bool(in_doubt),
+            error=error,
+        )
+
+    def __rich_repr__(self):
+        yield "key", self.key
+        yield "status", self.status
+        yield "invoice_id", self.invoice_id
+        yield "steps", self.steps
+        yield "attempts", self.attempts
+        yield "in_doubt", self.in_doubt
+        yield "error", self.error
+
+
+class Outbox:
+    """
+    A SQLite-backed queue of invoice writes. Enqueue everything first, then `drain` it
+    with an `ApiClient`. Each finished step is recorded as it happens, so a run which died
+    halfway can simply be drained again.
+
+    Every item has an idempotency key, which by default is a hash of what was enqueued
+    (including the invoice date, today unless given): enqueueing the same thing twice is
+    a no-op. Pass your own `key` if you really do want two identical invoices.
+
+    Only one `drain` should run against a given outbox file at a time.
+
+    An item is `in_doubt` from the moment a step starts until that step is recorded as
+    done: if the step was interrupted, it may or may not have reached Freshbooks. The
+    next try at an in-doubt step checks before repeating it. To make that check reliable,
+    created invoices get a reference derived from the key at the end of their `notes`.
+    """
+
+    def __init__(self, path: str | Path = OUTBOX_PATH):
+        self.path = Path(path)
+        self._connection = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(SCHEMA)
+        columns = [
+            row[1] for row in self._connection.execute("PRAGMA table_info(outbox)")
+        ]
+        if "in_doubt" not in columns:
+            self._connection.execute(
+                "ALTER TABLE outbox ADD COLUMN in_doubt INTEGER NOT NULL DEFAULT 0"
+            )
+        self._lock = threading.Lock()
+
+    def create_invoice(
+        self,
+        *,
+        key: str | None = None,
+        gateway_name: str | None = None,
+        send: bool = False,
+        **kwargs,
+    ) -> str:
+        """
+        `kwargs` are those of `ApiClient.create_invoice`. If `gateway_name` is given that
+        payment option gets added to the new invoice, and if `send` it then gets sent.
+        """
+        kwargs["create_date"] = str(kwargs.get("create_date") or dt.date.today())
+        steps = [CREATE]
+        if gateway_name is not None:
+            steps.append(ADD_PAYMENT_OPTION)
+        if send:
+            steps.append(SEND)
+        return self._enqueue(
+            payload={"invoice": kwargs, "gateway_name": gateway_name},
+            steps=steps,
+            key=key,
+        )
+
+    def send_invoice(self, invoice_id: int, key: str | None = None) -> str:
+        return self._enqueue(payload={}, steps=[SEND], invoice_id=invoice_id, key=key)
+
+    def add_payment_option_to_invoice(
+        self, invoice_id: int, gateway_name: str = "stripe", key: str | None = None
+    ) -> str:
+        return self._enqueue(
+            payload={"gateway_name": gateway_name},
+            steps=[ADD_PAYMENT_OPTION],
+            invoice_id=invoice_id,
+            key=key,
+        )
+
+    def items(self, status: str | None = None) -> list[OutboxItem]:
+        query = f"SELECT {COLUMNS} FROM outbox"
+        args: tuple = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            args = (status,)
+        with self._lock:
+            rows = self._connection.execute(f"{query} ORDER BY id", args).fetchall()
+        return [OutboxItem.from_row(*row) for row in rows]
+
+    def retry_failed(self) -> None:
+        """Give failed items another `max_attempts`. Whether they're in doubt stays put."""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE outbox SET status = ?, attempts = 0 WHERE status = ?",
+                (PENDING, FAILED),
+            )
+
+    def drain(
+        self,
+        api_client,
+        workers: int = 4,
+        max_attempts: int = 3,
+        backoff: float = 1.0,
+    ) -> list[OutboxItem]:
+        """
+        Work through everything not yet done, `workers` items at a time, retrying each up
+        to `max_attempts` times in total (across runs) with exponential `backoff` seconds.
+        Returns the outbox's items in their final state.
+        """
+        todo = self.items(PENDING) + self.items(IN_PROGRESS)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [
+                executor.submit(self._process, api_client, item, max_attempts, backoff)
+                for item in todo
+            ]:
+                future.result()
+        return self.items()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _enqueue(
+        self, *, payload: dict, steps: list[str], invoice_id=None, key=None
+    ) -> str:
+        if key is None:
+            key = hashlib.sha256(
+                json.dumps([payload, steps, invoice_id], sort_keys=True).encode()
+            ).hexdigest()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO outbox (key, payload, steps, invoice_id) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(payload), json.dumps(steps), invoice_id),
+            )
+        return key
+
+    def _process(
+        self, api_client, item: OutboxItem, max_attempts: int, backoff: float
+    ) -> None:
+        attempts = item.attempts
+        while attempts < max_attempts:
+            attempts += 1
+            item = self._item(item.key)
+            self._update(item.key, status=IN_PROGRESS, attempts=attempts)
+            try:
+                item = self._run_steps(api_client, item)
+            except Exception as e:
+                self._update(item.key, error=repr(e))
+                if attempts < max_attempts:
+                    time.sleep(backoff * 2 ** (attempts - 1))
+            else:
+                self._update(item.key, status=DONE, error=None)
+                return
+        self._update(item.key, status=FAILED)
+
+    def _run_steps(self, api_client, item: OutboxItem) -> OutboxItem:
+        invoice_id = item.invoice_id
+        steps = list(item.steps)
+        maybe_done = item.in_doubt
+        while steps:
+            step = steps[0]
+            # recorded before touching the API: if we die or time out mid-request, the
+            # next try knows this step may already have gone out
+            self._update(item.key, in_doubt=1)
+            if step == CREATE:
+                invoice_id = _create_once(
+                    api_client,
+                    item.payload["invoice"],
+                    ref=_ref(item.key),
+                    maybe_done=maybe_done,
+                )
+            elif step == ADD_PAYMENT_OPTION:
+                api_client.add_payment_option_to_invoice(
+                    invoice_id, gateway_name=item.payload["gateway_name"]
+                )
+            elif step == SEND:
+                _send_once(api_client, invoice_id, maybe_done=maybe_done)
+            steps.pop(0)
+            self._update(
+                item.key, invoice_id=invoice_id, steps=json.dumps(steps), in_doubt=0
+            )
+            maybe_done = False
+        return item._replace(invoice_id=invoice_id, steps=steps, in_doubt=False)
+
+    def _item(self, key: str) -> OutboxItem:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {COLUMNS} FROM outbox WHERE key = ?",
+                (key,),
+            ).fetchone()
+        return OutboxItem.from_row(*row)
+
+    def _update(self, key: str, **columns) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._lock:
+            self._connection.execute(
+                f"UPDATE outbox SET {assignments} WHERE key = ?",
+                (*columns.values(), key),
+            )
+
+
+def _create_once(api_client, invoice: dict, ref: str, maybe_done: bool) -> int:
+    """
+    `ref` goes at the end of the invoice's `notes`. Before re-posting an invoice which may
+    already have been created, look for one for the same client and date carrying it.
+    """
+    invoice = {**invoice, "notes": f"{invoice['notes']}\n\n{ref}"}
+    if maybe_done:
+        for existing in api_client.get_all_invoices_for_client_id(
+            invoice["client_id"], includes=()
+        ):
+            if (
+                existing.notes == invoice["notes"]
+                and str(existing.date) == invoice["create_date"]
+            ):
+                return existing.invoice_id
+    return api_client.create_invoice(**invoice)["invoice"]["id"]
+
+
+def _ref(key: str) -> str:
+    return f"Ref: {hashlib.sha256(key.encode()).hexdigest()[:16]}"
+
+
+def _send_once(api_client, invoice_id: int, maybe_done: bool) -> None:
+    if maybe_done:
+        if api_client.get_one_invoice(invoice_id, includes=()).status != "draft":
+            return
+    api_client.send_invoice(invoice_id)
@@ -0,0 +1,139 @@
+import collections
+import contextlib
+import functools
+import threading
+import time
+import tracemalloc
+import typing
+
+AUTH = "auth"
+NETWORK = "network"
+DECODE = "decode"
+PARSE = "parse"
+PHASES = (AUTH, NETWORK, DECODE, PARSE)
+
+
+class CallProfile(typing.NamedTuple):
+    """
+    One `ApiClient` method call. `parse` is whatever time the call spent outside of
+    requests: mostly building `FreshbooksInvoice`s, `FreshbooksClient`s and so on.
+    """
+
+    method: str
+    total: float
+    seconds: dict[str, float]
+    allocated: dict[str, int]
+
+    def __rich_repr__(self):
+        yield "method", self.method
+        yield "total", self.total
+        yield "seconds", self.seconds
+        yield "allocated", self.allocated
+
+
+class Profiler:
+    """
+    Collects a `CallProfile` per `ApiClient` call while `ApiClient.profile()` is active.
+
+    `trace_allocations`
+      Also record the net bytes allocated in each phase, via `tracemalloc`. This slows
+      everything down, and with several threads the numbers blur into each other.
+    """
+
+    def __init__(self, trace_allocations: bool = False):
+        self.trace_allocations = trace_allocations
+        self.calls: list[CallProfile] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def call(self, method: str):
+        if getattr(self._local, "seconds", None) is not None:
+            # a method called by another one is part of the outer call
+            yield
+            return
+        self._local.seconds = collections.Counter()
+        self._local.allocated = collections.Counter()
+        start, start_memory = time.perf_counter(), self._memory()
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - start
+            seconds, allocated = self._local.seconds, self._local.allocated
+            self._local.seconds = self._local.allocated = None
+            seconds[PARSE] = max(total - sum(seconds.values()), 0.0)
+            if self.trace_allocations:
+                allocated[PARSE] = self._memory() - start_memory - sum(allocated.values())
+            with self._lock:
+                self.calls.append(
+                    CallProfile(
+                        method=method,
+                        total=total,
+                        seconds=dict(seconds),
+                        allocated=dict(allocated),
+                    )
+                )
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start, start_memory = time.perf_counter(), self._memory()
+        try:
+            yield
+        finally:
+            seconds = getattr(self._local, "seconds", None)
+            if seconds is not None:
+                seconds[name] += time.perf_counter() - start
+                if self.trace_allocations:
+                    self._local.allocated[name] += self._memory() - start_memory
+
+    def totals(self) -> dict[str, float]:
+        totals = collections.Counter()
+        with self._lock:
+            for call in self.calls:
+                totals.update(call.seconds)
+        return {phase: totals[phase] for phase in PHASES}
+
+    def summary(self) -> str:
+        """A table of time (and allocations, if traced) per method and phase."""
+        by_method: dict[str, list[CallProfile]] = collections.defaultdict(list)
+        with self._lock:
+            for call in self.calls:
+                by_method[call.method].append(call)
+
+        header = f"{'method':<36}{'calls':>7}{'total s':>10}" + "".join(
+            f"{phase + ' s':>11}" for phase in PHASES
+        )
+        if self.trace_allocations:
+            header += "".join(f"{phase + ' KiB':>13}" for phase in PHASES)
+        rows = [header]
+        for method, calls in sorted(by_method.items()):
+            row = f"{method:<36}{len(calls):>7}{sum(c.total for c in calls):>10.3f}"
+            row += "".join(
+                f"{sum(c.seconds.get(phase, 0.0) for c in calls):>11.3f}"
+                for phase in PHASES
+            )
+            if self.trace_allocations:
+                row += "".join(
+                    f"{sum(c.allocated.get(phase, 0) for c in calls) / 1024:>13.1f}"
+                    for phase in PHASES
+                )
+            rows.append(row)
+        return "\n".join(rows)
+
+    def _memory(self) -> int:
+        if not self.trace_allocations:
+            return 0
+        return tracemalloc.get_traced_memory()[0]
+
+
+def profiled(method):
+    """Make an `ApiClient` method show up as a call of its own while profiling."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.profiler is None:
+            return method(self, *args, **kwargs)
+        with self.profiler.call(method.__name__):
+            return method(self, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,37 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Caps how many requests start per second and/or how many are in flight at once, across
+    every thread (and every `ApiClient`) using it. `ApiClient` enters it around each
+    request.
+    """
+
+    def __init__(self, per_second: float | None = None, max_in_flight: int | None = None):
+        self.interval = 1 / per_second if per_second else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+        self._slots = (
+            threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        )
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+    def __enter__(self):
+        if self._slots is not None:
+            self._slots.acquire()
+        self.wait()
+        return self
+
+    def __exit__(self, *_):
+        if self._slots is not None:
+            self._slots.release()
@@ -0,0 +1,100 @@
+import collections
+import datetime as dt
+import decimal
+import typing
+
+from avt_fresh.invoice import iter_raw
+
+AGE_BUCKETS = (30, 60, 90)
+
+
+class Receivables:
+    """
+    Running totals over a stream of invoice dictionaries. Memory grows with the number of
+    clients and months, never with the number of invoices.
+    """
+
+    def __init__(self, as_of: dt.date | None = None, age_buckets=AGE_BUCKETS):
+        if not age_buckets:
+            raise ValueError("age_buckets needs at least one upper bound (in days)")
+        self.as_of = as_of or dt.date.today()
+        self.age_buckets = tuple(sorted(age_buckets))
+        self.num_invoices = 0
+        self.outstanding = decimal.Decimal(0)
+        self.outstanding_by_client: dict[int, decimal.Decimal] = _totals()
+        self.outstanding_by_org_name: dict[str, decimal.Decimal] = _totals()
+        self.outstanding_by_status: dict[str, decimal.Decimal] = _totals()
+        self.outstanding_by_age_bucket: dict[str, decimal.Decimal] = _totals()
+        self.outstanding_by_client_and_age_bucket: dict[
+            int, dict[str, decimal.Decimal]
+        ] = collections.defaultdict(_totals)
+        self.revenue_by_month: dict[str, decimal.Decimal] = _totals()
+
+    def add(self, invoice: dict) -> None:
+        status = invoice["v3_status"]
+        # an unsent draft hasn't been billed: it's neither revenue nor receivable
+        if status == "draft":
+            return
+        self.num_invoices += 1
+        date = dt.date.fromisoformat(invoice["create_date"])
+        self.revenue_by_month[f"{date:%Y-%m}"] += decimal.Decimal(
+            invoice["amount"]["amount"]
+        )
+
+        outstanding = decimal.Decimal(invoice["outstanding"]["amount"])
+        if not outstanding:
+            return
+        self.outstanding += outstanding
+        self.outstanding_by_client[invoice["customerid"]] += outstanding
+        self.outstanding_by_org_name[invoice["organization"]] += outstanding
+        self.outstanding_by_status[status] += outstanding
+        age_bucket = self._age_bucket(date)
+        self.outstanding_by_age_bucket[age_bucket] += outstanding
+        self.outstanding_by_client_and_age_bucket[invoice["customerid"]][
+            age_bucket
+        ] += outstanding
+
+    def _age_bucket(self, date: dt.date) -> str:
+        age = (self.as_of - date).days
+        lower = 0
+        for upper in self.age_buckets:
+            if age <= upper:
+                return f"{lower}-{upper}"
+            lower = upper + 1
+        return f"{self.age_buckets[-1]}+"
+
+    def __rich_repr__(self):
+        yield "num_invoices", self.num_invoices
+        yield "outstanding", self.outstanding
+        yield "outstanding_by_client", dict(self.outstanding_by_client)
+        yield "outstanding_by_org_name", dict(self.outstanding_by_org_name)
+        yield "outstanding_by_status", dict(self.outstanding_by_status)
+        yield "outstanding_by_age_bucket", dict(self.outstanding_by_age_bucket)
+        yield "outstanding_by_client_and_age_bucket", {
+            client_id: dict(buckets)
+            for client_id, buckets in self.outstanding_by_client_and_age_bucket.items()
+        }
+        yield "revenue_by_month", dict(self.revenue_by_month)
+
+
+def get_receivables(
+    *,
+    get_func: typing.Callable,
+    client_id=None,
+    status=None,
+    as_of: dt.date | None = None,
+    age_buckets=AGE_BUCKETS,
+) -> Receivables:
+    """
+    Outstanding totals by client, org name, status, age (days since `create_date`) and
+    client and age together, plus revenue by month, from a single paginated pass over the invoices. Drafts are
+    left out of all of them.
+    """
+    receivables = Receivables(as_of=as_of, age_buckets=age_buckets)
+    for invoice in iter_raw(get_func=get_func, client_id=client_id, status=status):
+        receivables.add(invoice)
+    return receivables
+
+
+def _totals() -> collections.defaultdict:
+    return collections.defaultdict(decimal.Decimal)
@@ -0,0 +1,57 @@
+import threading
+import typing
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpSession(typing.Protocol):
+    """
+    What `ApiClient` needs from its `session`: `requests.Session`, `ThreadLocalSession`
+    and `avt_fresh.http2.Http2Session` all fit.
+    """
+
+    def get(self, url: str, **kwargs):
+        ...
+
+    def put(self, url: str, **kwargs):
+        ...
+
+    def post(self, url: str, **kwargs):
+        ...
+
+
+class ThreadLocalSession:
+    """
+    Stands in for a `requests.Session` which is safe to share between threads.
+    `requests.Session` itself makes no such promise, so each thread gets a session of its
+    own, while one `HTTPAdapter` (and so one connection pool) sits under all of them.
+    """
+
+    def __init__(self, pool_maxsize: int = 32):
+        self.adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.session.get(url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.session.put(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.session.post(url, **kwargs)
+
+    def close(self) -> None:
+        self.adapter.close()
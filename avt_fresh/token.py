@@ -1,7 +1,9 @@
 import abc
 from dataclasses import dataclass
 import json
+import os
 from pathlib import Path
+import tempfile
 import typing
 
 import redis
@@ -29,6 +31,12 @@ class TokenTup(typing.NamedTuple):
 
 @dataclass
 class TokenStore(metaclass=abc.ABCMeta):
+    """
+    To use a store with an `ApiClientPool`, also give it a classmethod
+    `for_account(connection_string, account_id, connection=None)` returning a store
+    which keeps `account_id`'s token apart from other accounts'.
+    """
+
     @abc.abstractmethod
     def get(self) -> TokenTup:
         ...
@@ -37,33 +45,91 @@ class TokenStore(metaclass=abc.ABCMeta):
     def set(self, token_dict: dict) -> None:
         ...
 
+    @classmethod
+    def connect(cls, connection_string: str | None):
+        """
+        Whatever connection `for_account` stores can share, made once per `ApiClientPool`.
+        """
+        return None
+
 
 class TokenStoreOnDisk(TokenStore):
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else TOKEN_PATH
+
     @classmethod
-    def get(cls) -> TokenTup:
-        if not TOKEN_PATH.exists():
+    def for_account(
+        cls, connection_string: str | None, account_id: str, connection=None
+    ) -> "TokenStoreOnDisk":
+        """`connection_string` is the directory to keep the token files in."""
+        directory = Path(connection_string or ".")
+        return cls(directory / f"{TOKEN_PATH.stem}_{account_id}{TOKEN_PATH.suffix}")
+
+    def get(self) -> TokenTup:
+        if not self.path.exists():
             raise NoToken
-        with TOKEN_PATH.open(encoding="utf-8") as fin:
+        with self.path.open(encoding="utf-8") as fin:
             return TokenTup(**json.load(fin))
 
-    @classmethod
-    def set(cls, token_dict: dict) -> None:
-        if not TOKEN_PATH.exists():
-            print(f"token JSON didn't exist, creating it at {TOKEN_PATH}:")
-            TOKEN_PATH.touch()
-        with TOKEN_PATH.open("w", encoding="utf-8") as fout:
-            json.dump(token_dict, fout)
+    def set(self, token_dict: dict) -> None:
+        """
+        Writes to a temporary file and then swaps it in, so a concurrent `get` sees either
+        the old token or the new one, never half of one.
+        """
+        if not self.path.exists():
+            print(f"token JSON didn't exist, creating it at {self.path}:")
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=self.path.parent,
+            prefix=f".{self.path.name}.",
+            delete=False,
+        ) as fout:
+            try:
+                json.dump(token_dict, fout)
+            except BaseException:
+                fout.close()
+                os.unlink(fout.name)
+                raise
+        os.replace(fout.name, self.path)
 
 
 class TokenStoreOnRedis(TokenStore):
-    def __init__(self, redis_url, redis_db_num: int = 0):
-        self.redis_client = redis.from_url(redis_url, db=redis_db_num)
+    def __init__(
+        self,
+        redis_url=None,
+        redis_db_num: int = 0,
+        key: str = TOKEN_KEY,
+        redis_client: redis.Redis | None = None,
+    ):
+        """Pass `redis_client` to share one connection pool between several stores."""
+        if redis_client is None:
+            redis_client = redis.from_url(redis_url, db=redis_db_num)
+        self.redis_client = redis_client
+        self.key = key
+
+    @classmethod
+    def connect(cls, connection_string: str | None) -> redis.Redis:
+        return redis.from_url(connection_string)
+
+    @classmethod
+    def for_account(
+        cls,
+        connection_string: str | None,
+        account_id: str,
+        connection: redis.Redis | None = None,
+    ) -> "TokenStoreOnRedis":
+        return cls(
+            connection_string,
+            key=f"{TOKEN_KEY}:{account_id}",
+            redis_client=connection,
+        )
 
     def get(self) -> TokenTup:
-        result = self.redis_client.get(TOKEN_KEY)
+        result = self.redis_client.get(self.key)
         if result is None:
             raise NoToken
         return TokenTup(**json.loads(result))
 
     def set(self, token_dict: dict) -> None:
-        self.redis_client.set(TOKEN_KEY, json.dumps(token_dict))
+        self.redis_client.set(self.key, json.dumps(token_dict))
@@ -0,0 +1,183 @@
+"""
+Compare the default `requests` transport with `avt_fresh.http2.Http2Session` against
+local stand-in servers which answer every GET with an invoice-listing-sized JSON body
+after a fixed delay (standing in for Freshbooks' latency).
+
+    python benchmarks/bench_http2.py --requests 1000 --concurrency 50 --delay 0.02
+
+Needs `pip install avt-fresh[http2]`. The HTTP/2 server speaks cleartext HTTP/2 with
+prior knowledge, so no certificates are involved.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import h2.config
+import h2.connection
+import h2.events
+import h2.exceptions
+import requests
+from requests.adapters import HTTPAdapter
+
+from avt_fresh.http2 import Http2Session
+
+
+def make_body(num_invoices: int = 25) -> bytes:
+    invoice = {
+        "id": 1,
+        "invoice_number": "0000001",
+        "customerid": 1,
+        "organization": "Monsters Inc",
+        "create_date": "2022-04-01",
+        "v3_status": "sent",
+        "amount": {"amount": "1234.56", "code": "USD"},
+        "outstanding": {"amount": "1234.56", "code": "USD"},
+        "po_number": None,
+        "notes": "",
+    }
+    return json.dumps(
+        {"response": {"result": {"invoices": [invoice] * num_invoices, "pages": 1}}}
+    ).encode()
+
+
+class Http1Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay: float, body: bytes):
+        self.delay, self.body, self.connections = delay, body, 0
+        super().__init__(("127.0.0.1", 0), Http1Handler)
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+
+class Http1Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, *_):
+        pass
+
+
+class Http2Protocol(asyncio.Protocol):
+    def __init__(self, server: "Http2Server"):
+        self.server = server
+        self.connection = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+
+    def connection_made(self, transport):
+        self.server.connections += 1
+        self.transport = transport
+        self.connection.initiate_connection()
+        self.transport.write(self.connection.data_to_send())
+
+    def data_received(self, data: bytes):
+        for event in self.connection.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                asyncio.get_running_loop().call_later(
+                    self.server.delay, self.respond, event.stream_id
+                )
+        self.transport.write(self.connection.data_to_send())
+
+    def respond(self, stream_id: int):
+        body = self.server.body
+        try:
+            self.connection.send_headers(
+                stream_id,
+                [
+                    (":status", "200"),
+                    ("content-type", "application/json"),
+                    ("content-length", str(len(body))),
+                ],
+            )
+            self.connection.send_data(stream_id, body, end_stream=True)
+        except h2.exceptions.StreamClosedError:
+            return
+        self.transport.write(self.connection.data_to_send())
+
+
+class Http2Server:
+    def __init__(self, delay: float, body: bytes):
+        self.delay, self.body, self.connections = delay, body, 0
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            self.loop.create_server(lambda: Http2Protocol(self), "127.0.0.1", 0)
+        )
+        self.server_port = self.server.sockets[0].getsockname()[1]
+
+    def serve_forever(self):
+        self.loop.run_forever()
+
+
+def run(session, url: str, num_requests: int, concurrency: int) -> float:
+    def fetch(_):
+        response = session.get(
+            f"{url}/invoices?search[v3_status]=sent", params={}, headers={}
+        )
+        assert response.ok
+        return response.json()
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, range(num_requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.02)
+    args = parser.parse_args()
+    body = make_body()
+
+    http1_server = Http1Server(args.delay, body)
+    threading.Thread(target=http1_server.serve_forever, daemon=True).start()
+    http1_session = requests.Session()
+    http1_session.mount("http://", HTTPAdapter(pool_maxsize=args.concurrency))
+    http1_seconds = run(
+        http1_session,
+        f"http://127.0.0.1:{http1_server.server_port}",
+        args.requests,
+        args.concurrency,
+    )
+
+    http2_server = Http2Server(args.delay, body)
+    threading.Thread(target=http2_server.serve_forever, daemon=True).start()
+    # prior knowledge: talk HTTP/2 straight away over cleartext
+    http2_session = Http2Session(http1=False)
+    http2_seconds = run(
+        http2_session,
+        f"http://127.0.0.1:{http2_server.server_port}",
+        args.requests,
+        args.concurrency,
+    )
+
+    print(
+        f"{args.requests} GETs, {args.concurrency} at a time, {args.delay}s server delay"
+    )
+    for name, seconds, connections in (
+        ("HTTP/1.1 (requests)", http1_seconds, http1_server.connections),
+        ("HTTP/2 (httpx)", http2_seconds, http2_server.connections),
+    ):
+        print(
+            f"{name:<22}{seconds:>8.2f}s{args.requests / seconds:>10.1f} req/s"
+            f"{connections:>6} connections"
+        )
+
+
+if __name__ == "__main__":
+    main()
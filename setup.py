@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name="avt_fresh",
@@ -13,7 +13,15 @@ setup(
         "requests",
         "redis",
     ],
+    extras_require={
+        "http2": ["httpx[http2]"],
+    },
     packages=[
         "avt_fresh",
     ],
+    entry_points={
+        "console_scripts": [
+            "avt-fresh=avt_fresh.cli:main",
+        ],
+    },
 )
@@ -0,0 +1,144 @@
+import concurrent.futures
+import datetime as dt
+import threading
+import time
+
+import pytest
+
+from avt_fresh.api import ApiClient
+from avt_fresh.session import ThreadLocalSession
+from avt_fresh.token import TokenStoreOnDisk
+
+
+def make_token(i: int, created_at: int) -> dict:
+    return dict(
+        access_token=f"access{i}" * 200,
+        token_type="Bearer",
+        expires_in=100,
+        refresh_token=f"refresh{i}",
+        scope="admin:all:legacy",
+        created_at=created_at,
+    )
+
+
+def test_token_file_is_never_read_half_written(tmp_path):
+    store = TokenStoreOnDisk(tmp_path / "token.json")
+    store.set(make_token(0, 0))
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                store.get()
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(300):
+        store.set(make_token(i, 0))
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert [p.name for p in tmp_path.iterdir()] == ["token.json"]
+
+
+def test_failed_token_write_leaves_no_temp_file(tmp_path):
+    store = TokenStoreOnDisk(tmp_path / "token.json")
+    store.set(make_token(0, 0))
+
+    with pytest.raises(TypeError):
+        store.set({"not": object()})
+
+    assert [p.name for p in tmp_path.iterdir()] == ["token.json"]
+    assert store.get().refresh_token == "refresh0"
+
+
+def test_expired_token_is_refreshed_once(tmp_path):
+    store = TokenStoreOnDisk(tmp_path / "token.json")
+    store.set(make_token(0, 0))
+    client = ApiClient("secret", "id", "https://example.com", "acct", token_store=store)
+    refreshes = []
+
+    def refresh(refresh_token):
+        refreshes.append(refresh_token)
+        time.sleep(0.1)
+        return make_token(1, int(dt.datetime.now().timestamp()))
+
+    client._get_token_from_api_with_refresh_token = refresh
+    with concurrent.futures.ThreadPoolExecutor(max_workers=32) as executor:
+        tokens = set(executor.map(lambda _: client._get_access_token(), range(64)))
+
+    assert refreshes == ["refresh0"]
+    assert tokens == {make_token(1, 0)["access_token"]}
+
+
+def test_concurrent_identical_gets_are_coalesced():
+    client = ApiClient("secret", "id", "https://example.com", "acct")
+    calls = []
+
+    def request(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.1)
+        return {"invoice": {"id": 1}}
+
+    client._REQUEST = request
+    barrier = threading.Barrier(16)
+
+    def get(_):
+        barrier.wait()
+        return client._GET(what="invoice", endpoint="1")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(get, range(16)))
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_get_after_write_doesnt_join_older_get():
+    client = ApiClient("secret", "id", "https://example.com", "acct")
+    invoice = {"id": 1, "notes": "old"}
+    first_get_started = threading.Event()
+
+    def request(*, method_name, stuff=None, **_):
+        if method_name == "PUT":
+            invoice.update(stuff["invoice"])
+            return {"invoice": dict(invoice)}
+        snapshot = dict(invoice)
+        first_get_started.set()
+        time.sleep(0.2)
+        return {"invoice": snapshot}
+
+    client._REQUEST = request
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        stale = executor.submit(client._GET, what="invoice", endpoint="1")
+        first_get_started.wait()
+        client._PUT(what="invoice", thing_id=1, data={"invoice": {"notes": "new"}})
+        fresh = client._GET(what="invoice", endpoint="1")
+
+    assert stale.result()["invoice"]["notes"] == "old"
+    assert fresh["invoice"]["notes"] == "new"
+
+
+def test_thread_local_session_shares_one_connection_pool():
+    session = ThreadLocalSession()
+    barrier = threading.Barrier(4)
+    sessions = []
+
+    def grab():
+        barrier.wait()
+        sessions.append(session.session)
+
+    threads = [threading.Thread(target=grab) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(s) for s in sessions}) == 4
+    assert len({id(s.adapters["https://"]) for s in sessions}) == 1